@@ -0,0 +1,177 @@
+# movie_recommender/backend/app/encoder.py
+
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Must match the model used by data_ingestion/populate_db.py, or query vectors
+# won't live in the same space as the stored movie embeddings
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Same settings as data_ingestion/embedding_backend.py: torch | onnx | onnx-int8,
+# optionally loaded from a local export so no network is needed.
+# The two images don't share code, so keep embedding_settings/check_embedding_config/
+# load_sentence_transformer in sync with embedding_settings/check_embedding_config/load_model
+# there (tests/test_embedding_backend.py checks that both produce the same models).
+BACKENDS = ("torch", "onnx", "onnx-int8")
+QUANTIZED_FILE_NAME = "onnx/model_int8.onnx"
+
+
+def embedding_settings(backend=None, model_path=None):
+    """
+    Fills in (backend, model_path) from EMBEDDING_BACKEND / EMBEDDING_MODEL_PATH where not given.
+    Read on every call rather than at import, so main.py's load_dotenv() applies.
+    """
+    if backend is None:
+        backend = os.getenv("EMBEDDING_BACKEND", "torch")
+    if model_path is None:
+        model_path = os.getenv("EMBEDDING_MODEL_PATH") or None
+    return backend, model_path
+
+
+def check_embedding_config(backend=None, model_path=None):
+    """Raises ValueError for settings that would otherwise only fail once the model is loaded."""
+    backend, model_path = embedding_settings(backend, model_path)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    if backend == "onnx-int8" and model_path is None:
+        raise ValueError("The onnx-int8 backend needs EMBEDDING_MODEL_PATH pointing at a model exported with --quantize")
+    if model_path is not None and not os.path.isdir(model_path):
+        raise ValueError(f"EMBEDDING_MODEL_PATH '{model_path}' is not a directory")
+
+
+def load_sentence_transformer(backend=None, model_path=None):
+    backend, model_path = embedding_settings(backend, model_path)
+    check_embedding_config(backend, model_path)
+    # Imported here so the API (and its tests) can start without torch installed
+    from sentence_transformers import SentenceTransformer
+
+    source = model_path or MODEL_NAME
+    kwargs = {"device": "cpu", "local_files_only": model_path is not None}
+    if backend == "torch":
+        return SentenceTransformer(source, **kwargs)
+    if backend == "onnx-int8":
+        kwargs["model_kwargs"] = {"file_name": QUANTIZED_FILE_NAME}
+    return SentenceTransformer(source, backend="onnx", **kwargs)
+
+
+def cache_key(text: str) -> str:
+    # all-MiniLM-L6-v2 uses an uncased tokenizer, so case and spacing don't change the vector
+    return " ".join(text.lower().split())
+
+
+class BatchingEncoder:
+    """
+    Encodes free-text queries with dynamic micro-batching.
+
+    Concurrent encode() calls are queued and a single worker groups them into one
+    model.encode() call, flushing when max_batch_size texts are waiting or max_wait_ms
+    has passed since the first one arrived. Inference runs in a worker thread so the
+    event loop keeps accepting requests (which then form the next, larger batch).
+    Finished vectors go into an LRU cache, and identical in-flight texts share one slot.
+    """
+
+    def __init__(self, load_model=load_sentence_transformer, max_batch_size=32, max_wait_ms=5.0, cache_size=1024):
+        self._load_model = load_model
+        self._model = None
+        self._load_error = None
+        self._model_lock = threading.Lock()
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._pending: dict[str, asyncio.Future] = {}
+        self._queue = None
+        self._loop = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        # Restart the worker if it is bound to another (e.g. closed test) event loop
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._pending = {}
+            self._worker = loop.create_task(self._run())
+
+    def get_model(self):
+        with self._model_lock:
+            if self._model is None:
+                # A failed load (missing files, no network) won't fix itself, so don't retry
+                # it on every batch; restart the API after fixing the configuration
+                if self._load_error is not None:
+                    raise self._load_error
+                try:
+                    self._model = self._load_model()
+                except Exception as e:
+                    self._load_error = e
+                    raise
+            return self._model
+
+    def _encode_batch(self, texts: list[str]) -> np.ndarray:
+        model = self.get_model()
+        return np.asarray(model.encode(texts, batch_size=len(texts)))
+
+    def _remember(self, key: str, vector: np.ndarray):
+        if self.cache_size <= 0:
+            return
+        self._cache[key] = vector
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def encode(self, text: str) -> np.ndarray:
+        key = cache_key(text)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        self._ensure_worker()
+        future = self._pending.get(key)
+        if future is None:
+            future = self._loop.create_future()
+            self._pending[key] = future
+            self._queue.put_nowait(key)
+        # Shielded so one disconnecting client doesn't cancel the result for the others
+        return await asyncio.shield(future)
+
+    async def _next_batch(self) -> list[str]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            try:
+                vectors = await loop.run_in_executor(None, self._encode_batch, batch)
+            except Exception as e:
+                print(f"Error encoding batch of {len(batch)} queries: {e}")
+                for key in batch:
+                    future = self._pending.pop(key)
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for key, vector in zip(batch, vectors):
+                self._remember(key, vector)
+                future = self._pending.pop(key)
+                if not future.done():
+                    future.set_result(vector)
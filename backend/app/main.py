@@ -1,16 +1,21 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Body, FastAPI, Header, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware # For React frontend
+from fastapi.responses import ORJSONResponse # orjson is much faster than the stdlib encoder
 import psycopg2
 import numpy as np
+import asyncio
+import hashlib
 import os
 import random
 from dotenv import load_dotenv
 from pgvector.psycopg2 import register_vector # Import the registration function
+from app.encoder import BatchingEncoder, check_embedding_config
+from app.title_index import TitleIndex
 
 # Load environment variables from .env file
 load_dotenv(dotenv_path="../../.env") # Adjust path if .env is elsewhere relative to main.py
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # --- CORS ---
 # Allow your React frontend to communicate (adjust origins as needed)
@@ -39,6 +44,13 @@ DB_NAME = os.getenv("POSTGRES_DB")
 DB_USER = os.getenv("POSTGRES_USER")
 DB_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 
+# Free-text query encoder (see /recommend/text); model is loaded on first use
+text_encoder = BatchingEncoder(
+    max_batch_size=int(os.getenv("ENCODER_MAX_BATCH_SIZE", "32")),
+    max_wait_ms=float(os.getenv("ENCODER_MAX_WAIT_MS", "5")),
+    cache_size=int(os.getenv("ENCODER_CACHE_SIZE", "1024")),
+)
+
 def get_db_connection():
     try:
         conn = psycopg2.connect(
@@ -55,9 +67,114 @@ def get_db_connection():
         # In a real app, you might want a more robust retry or error handling
         raise HTTPException(status_code=503, detail="Database connection error")
 
+# In-memory prefix/trigram index over movies.title, used by /autocomplete and by
+# /recommend to resolve near-miss titles. Built on startup (or lazily by /autocomplete).
+title_index = None
+
+def build_title_index():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, title, popularity FROM movies;")
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return TitleIndex(rows)
+
+def load_title_index():
+    global title_index
+    title_index = build_title_index()
+    return title_index
+
+# Changes whenever movies are added, removed or updated; part of every ETag so clients
+# and CDNs can revalidate with If-None-Match without the request touching the DB.
+# Refreshed in the background every CATALOG_REFRESH_SECONDS (None until first loaded).
+catalog_version = None
+CATALOG_REFRESH_SECONDS = int(os.getenv("CATALOG_REFRESH_SECONDS", "60"))
+
+def load_catalog_version():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT count(*), max(updated_at) FROM movies;")
+    count, last_updated = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    return f"{count}:{last_updated.timestamp() if last_updated else 0}"
+
+def fetch_catalog_update(current_version):
+    """Returns (version, new title index) if the catalog changed since current_version, else None."""
+    version = load_catalog_version()
+    if version == current_version:
+        return None
+    return version, build_title_index()
+
+def apply_catalog_update(update):
+    # Swaps index and version in one step; run on the event loop so no request can
+    # serve content from the new index under the previous version's ETag
+    global catalog_version, title_index
+    if update is None:
+        return
+    catalog_version, title_index = update
+    print(f"Catalog version {catalog_version}: title index built with {len(title_index)} titles.")
+
+def refresh_catalog():
+    apply_catalog_update(fetch_catalog_update(catalog_version))
+
+async def refresh_catalog_periodically():
+    while True:
+        await asyncio.sleep(CATALOG_REFRESH_SECONDS)
+        try:
+            # The DB work and index build happen on a worker thread, the swap back on the loop
+            update = await asyncio.to_thread(fetch_catalog_update, catalog_version)
+            apply_catalog_update(update)
+        except Exception as e:
+            print(f"Failed to refresh catalog version: {e}")
+
+# --- Response helpers ---
+MOVIE_FIELDS = ("id", "title", "overview", "poster_url", "release_year")
+FIELDS_DESCRIPTION = "Comma-separated subset of " + ",".join(MOVIE_FIELDS)
+MAX_RESULTS = 50
+
+def parse_fields(fields: str | None) -> list[str]:
+    """Turns ?fields=id,title into a validated column list (all of MOVIE_FIELDS by default)."""
+    if not fields:
+        return list(MOVIE_FIELDS)
+    requested = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in requested if f not in MOVIE_FIELDS]
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(MOVIE_FIELDS)}",
+        )
+    return requested
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(repr((catalog_version,) + parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+def conditional_response(if_none_match, etag_parts, build_content):
+    """
+    Returns 304 if the client's ETag is current, else the ORJSON body from build_content().
+    No ETag is sent until the catalog version is known, so a stale one can't be cached.
+    """
+    if catalog_version is None:
+        return ORJSONResponse(build_content())
+    etag = make_etag(*etag_parts)
+    headers = {"ETag": etag, "Cache-Control": "public, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return ORJSONResponse(build_content(), headers=headers)
+
 
 @app.on_event("startup")
 async def startup_event():
+    # Fail fast on a bad EMBEDDING_BACKEND/EMBEDDING_MODEL_PATH instead of on the first /recommend/text
+    check_embedding_config()
     # You can add a check here to ensure DB is accessible or tables exist
     print("Application startup: Attempting to connect to database...")
     try:
@@ -67,12 +184,14 @@ async def startup_event():
         print("Database connection successful.")
         cursor.close()
         conn.close()
+        refresh_catalog()
     except Exception as e:
         print(f"Failed to connect to database on startup: {e}")
         # Decide if the app should fail to start or continue with degraded functionality
+    # Keeps retrying even if the DB wasn't reachable yet
+    app.state.catalog_refresher = asyncio.create_task(refresh_catalog_periodically())
 
-@app.post("/recommend")
-async def recommend_movies(titles: list[str]):
+def validate_titles(titles):
     # Validate input length
     if len(titles) != 3:
         raise HTTPException(status_code=400, detail="Please provide exactly 3 movie/TV titles.")
@@ -81,20 +200,36 @@ async def recommend_movies(titles: list[str]):
         if not isinstance(title, str) or not title.strip():
             raise HTTPException(status_code=400, detail="Input titles must be non-empty strings")
 
+def find_recommendations(titles, limit, columns):
+    """
+    Returns the response body: the recommendations plus "resolved_titles", which maps
+    each (stripped) input that was matched through the title index to the title actually used.
+    The body depends only on the stripped titles in order; GET /recommend's ETag relies on that.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
 
     embeddings = []
     input_movie_ids = []
+    resolved_titles = {}
 
     for title_input in titles:
+        lookup_title = title_input.strip()
         # Use ILIKE for case-insensitive search and exact match on title (or fuzzy match)
         # You might need more sophisticated title matching in a real app
         cursor.execute(
             "SELECT id, embedding FROM movies WHERE lower(title) = lower(%s) LIMIT 1",
-            (title_input.strip(),)
+            (lookup_title,)
         )
         result = cursor.fetchone()
+        if not result and title_index is not None:
+            # Fall back to the title index for typos, punctuation and accent differences
+            match = title_index.resolve(lookup_title)
+            if match:
+                cursor.execute("SELECT id, embedding FROM movies WHERE id = %s", (match[0],))
+                result = cursor.fetchone()
+                if result:
+                    resolved_titles[lookup_title] = match[1]
         if result:
             input_movie_ids.append(result[0])
             embeddings.append(np.array(result[1]))
@@ -112,37 +247,118 @@ async def recommend_movies(titles: list[str]):
     profile_vector = np.mean(embeddings, axis=0)
     profile_vector_str = "[" + ",".join(map(str, profile_vector)) + "]"
 
+    # columns come from parse_fields(), so only whitelisted names reach the SQL
     placeholders = ','.join(['%s'] * len(input_movie_ids))
     query = f"""
-        SELECT id, title, overview, poster_url, release_year
+        SELECT {', '.join(columns)}
         FROM movies
         WHERE id NOT IN ({placeholders})
         ORDER BY embedding <=> %s::vector
-        LIMIT 10;
+        LIMIT %s;
     """
-    params = list(input_movie_ids) + [profile_vector_str]
+    params = list(input_movie_ids) + [profile_vector_str, limit]
     cursor.execute(query, tuple(params))
     recommendations_raw = cursor.fetchall()
     cursor.close()
     conn.close()
 
-    recommendations = [
-        {"id": r[0], "title": r[1], "overview": r[2], "poster_url": r[3], "release_year": r[4]}
-        for r in recommendations_raw[:3]
-    ]
-    return {"recommendations": recommendations}
+    return {
+        "recommendations": [dict(zip(columns, r)) for r in recommendations_raw],
+        "resolved_titles": resolved_titles,
+    }
+
+@app.post("/recommend")
+async def recommend_movies(
+    titles: list[str],
+    limit: int = Query(3, ge=1, le=MAX_RESULTS),
+    fields: str | None = Query(None, description=FIELDS_DESCRIPTION),
+):
+    validate_titles(titles)
+    columns = parse_fields(fields)
+    return find_recommendations(titles, limit, columns)
+
+@app.get("/recommend")
+async def recommend_movies_cacheable(
+    title: list[str] = Query(...),
+    limit: int = Query(3, ge=1, le=MAX_RESULTS),
+    fields: str | None = Query(None, description=FIELDS_DESCRIPTION),
+    if_none_match: str | None = Header(None),
+):
+    """Same as POST /recommend with ?title=...&title=...&title=..., plus ETag / If-None-Match support."""
+    validate_titles(title)
+    columns = parse_fields(fields)
+    # Keyed on exactly what shapes the body: case, inner spacing and order all show up in
+    # resolved_titles (and in which lookups miss), so only the surrounding whitespace is dropped
+    input_titles = tuple(t.strip() for t in title)
+    return conditional_response(
+        if_none_match,
+        ("recommend", input_titles, limit, tuple(columns)),
+        lambda: find_recommendations(title, limit, columns),
+    )
+
+@app.post("/recommend/text")
+async def recommend_from_text(
+    query: str = Body(..., embed=True, min_length=1, max_length=500),
+    limit: int = Query(3, ge=1, le=MAX_RESULTS),
+    fields: str | None = Query(None, description=FIELDS_DESCRIPTION),
+):
+    if not query.strip():
+        raise HTTPException(status_code=400, detail="Query must be a non-empty string")
+    columns = parse_fields(fields)
+
+    try:
+        query_vector = await text_encoder.encode(query)
+    except Exception as e:
+        print(f"Error encoding query: {e}")
+        raise HTTPException(status_code=503, detail="Text encoder unavailable")
+    query_vector_str = "[" + ",".join(map(str, query_vector)) + "]"
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT {', '.join(columns)}
+        FROM movies
+        ORDER BY embedding <=> %s::vector
+        LIMIT %s;
+    """, (query_vector_str, limit))
+    recommendations_raw = cursor.fetchall()
+    cursor.close()
+    conn.close()
+
+    return {"recommendations": [dict(zip(columns, r)) for r in recommendations_raw]}
+
+@app.get("/autocomplete")
+async def autocomplete(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=MAX_RESULTS),
+    if_none_match: str | None = Header(None),
+):
+    def build_content():
+        index = title_index if title_index is not None else load_title_index()
+        suggestions = [
+            {"id": movie_id, "title": title, "score": score}
+            for movie_id, title, score in index.search(q, limit)
+        ]
+        return {"suggestions": suggestions}
+
+    return conditional_response(if_none_match, ("autocomplete", " ".join(q.lower().split()), limit), build_content)
 
 @app.get("/surprise")
-async def surprise_me():
+async def surprise_me(
+    limit: int = Query(3, ge=1, le=MAX_RESULTS),
+    fields: str | None = Query(None, description=FIELDS_DESCRIPTION),
+):
+    # Random by design, so no ETag here
+    columns = parse_fields(fields)
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id, title, overview, poster_url, release_year
+    cursor.execute(f"""
+        SELECT {', '.join(columns)}
         FROM movies
         WHERE rating IS NOT NULL AND popularity IS NOT NULL AND rating > 7.0 AND popularity > 100 -- Adjust as needed
         ORDER BY RANDOM()
-        LIMIT 3;
-    """)
+        LIMIT %s;
+    """, (limit,))
     surprises_raw = cursor.fetchall()
     cursor.close()
     conn.close()
@@ -150,11 +366,7 @@ async def surprise_me():
     if not surprises_raw:
         raise HTTPException(status_code=404, detail="Could not find surprise movies. DB might be empty or criteria too strict.")
 
-    surprises = [
-        {"id": r[0], "title": r[1], "overview": r[2], "poster_url": r[3], "release_year": r[4]}
-        for r in surprises_raw
-    ]
-    return {"surprises": surprises}
+    return {"surprises": [dict(zip(columns, r)) for r in surprises_raw]}
 
 # To run locally using uvicorn directly (outside Docker for quick tests):
 # cd movie_recommender/backend
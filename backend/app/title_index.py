@@ -0,0 +1,210 @@
+# movie_recommender/backend/app/title_index.py
+
+import bisect
+import re
+import unicodedata
+
+# Fuzzy matches below this trigram similarity are not worth suggesting
+MIN_SIMILARITY = 0.3
+# /recommend only auto-corrects a title when the best match is at least this close
+RESOLVE_MIN_SIMILARITY = 0.5
+# Prefixes matching more keys than this get their best matches precomputed at build time,
+# so a lookup never walks more than PREFIX_SCAN_LIMIT keys
+PREFIX_SCAN_LIMIT = 1000
+# How many ranked matches are kept per precomputed prefix (the API caps limit at 50)
+PREFIX_TOP_K = 50
+# Upper bound on titles scored per fuzzy lookup; rare trigrams are visited first
+FUZZY_CANDIDATE_LIMIT = 2000
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_title(title: str) -> str:
+    """Lowercases, strips accents and collapses punctuation/whitespace to single spaces."""
+    decomposed = unicodedata.normalize("NFKD", title)
+    ascii_only = decomposed.encode("ascii", "ignore").decode("ascii")
+    return _NON_ALNUM.sub(" ", ascii_only.lower()).strip()
+
+
+def trigrams(normalized: str) -> set[str]:
+    """Word trigrams padded the same way as pg_trgm ("  w", " wo", "wor", "ord", "rd ")."""
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class TitleIndex:
+    """
+    In-memory typeahead index over movie titles.
+
+    Prefix lookups use a sorted list of keys (the full normalized title plus every
+    word-suffix of it, so "knight" finds "The Dark Knight") searched with bisect.
+    Prefixes too common to scan per keystroke ("t", "the") get their top PREFIX_TOP_K
+    matches, in search() order, precomputed over the whole catalog.
+    Fuzzy lookups use an inverted trigram index scored like pg_trgm's similarity().
+    """
+
+    def __init__(self, rows):
+        # rows: iterable of (id, title, popularity)
+        self.titles: dict[int, str] = {}
+        self._normalized: dict[int, str] = {}
+        self._popularity: dict[int, float] = {}
+        self._grams: dict[int, set[str]] = {}
+        self._postings: dict[str, list[int]] = {}
+        self._exact: dict[str, list[int]] = {}
+        keys = []
+
+        for movie_id, title, popularity in rows:
+            normalized = normalize_title(title)
+            if not normalized:
+                continue
+            self.titles[movie_id] = title
+            self._normalized[movie_id] = normalized
+            self._popularity[movie_id] = popularity or 0.0
+            self._exact.setdefault(normalized, []).append(movie_id)
+
+            words = normalized.split(" ")
+            for position in range(len(words)):
+                keys.append((" ".join(words[position:]), position, movie_id))
+
+            grams = trigrams(normalized)
+            self._grams[movie_id] = grams
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(movie_id)
+
+        keys.sort()
+        self._keys = keys
+        self._prefix_top: dict[str, dict[int, int]] = {}
+        self._build_prefix_top()
+
+    def __len__(self):
+        return len(self.titles)
+
+    def _key_range(self, prefix: str, lo: int = 0, hi: int | None = None) -> tuple[int, int]:
+        """[start, end) of the keys starting with prefix."""
+        hi = len(self._keys) if hi is None else hi
+        # Normalized text is [a-z0-9 ], so bumping the last character gives the first key past the prefix
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return bisect.bisect_left(self._keys, (prefix,), lo, hi), bisect.bisect_left(self._keys, (upper,), lo, hi)
+
+    def _scan_matches(self, start: int, end: int) -> dict[int, int]:
+        """Returns {movie_id: word position of the earliest match} for keys[start:end]."""
+        matches = {}
+        for i in range(start, end):
+            _, position, movie_id = self._keys[i]
+            if position < matches.get(movie_id, position + 1):
+                matches[movie_id] = position
+        return matches
+
+    def _prefix_rank(self, movie_id: int, position: int):
+        # Same order search() produces: whole-title prefixes, then popularity, then title
+        return (position != 0, -self._popularity[movie_id], self.titles[movie_id])
+
+    def _build_prefix_top(self):
+        # Walk the implicit trie over the sorted keys, descending only into prefixes with
+        # more than PREFIX_SCAN_LIMIT keys; every ancestor of such a prefix is heavy too,
+        # so any prefix missing from _prefix_top is cheap to scan directly
+        stack = []
+        start = 0
+        while start < len(self._keys):
+            child = self._keys[start][0][:1]
+            child_start, child_end = self._key_range(child, start)
+            stack.append((child, child_start, child_end))
+            start = child_end
+
+        while stack:
+            prefix, start, end = stack.pop()
+            if end - start <= PREFIX_SCAN_LIMIT:
+                continue
+            matches = self._scan_matches(start, end)
+            top = sorted(matches.items(), key=lambda item: self._prefix_rank(*item))[:PREFIX_TOP_K]
+            self._prefix_top[prefix] = dict(top)
+
+            depth = len(prefix)
+            i = start
+            while i < end and len(self._keys[i][0]) == depth:
+                i += 1 # Key equal to the prefix itself has no next character
+            while i < end:
+                child = self._keys[i][0][:depth + 1]
+                child_start, child_end = self._key_range(child, i, end)
+                stack.append((child, child_start, child_end))
+                i = child_end
+
+    def _prefix_matches(self, prefix: str) -> dict[int, int]:
+        """Returns {movie_id: word position of the earliest match} for keys starting with prefix."""
+        top = self._prefix_top.get(prefix)
+        if top is not None:
+            return top
+        return self._scan_matches(*self._key_range(prefix))
+
+    def _fuzzy_matches(self, normalized: str) -> dict[int, float]:
+        """Returns {movie_id: similarity} for titles sharing enough trigrams with the query."""
+        query_grams = trigrams(normalized)
+        if not query_grams:
+            return {}
+        # Collect candidates from the rarest trigrams first and stop before common ones
+        # ("  t", "the") would drag in most of the catalog
+        candidates = set()
+        for gram in sorted(query_grams, key=lambda g: len(self._postings.get(g, ()))):
+            posting = self._postings.get(gram, ())
+            if candidates and len(candidates) + len(posting) > FUZZY_CANDIDATE_LIMIT:
+                break
+            candidates.update(posting[:FUZZY_CANDIDATE_LIMIT])
+
+        matches = {}
+        for movie_id in candidates:
+            grams = self._grams[movie_id]
+            common = len(query_grams & grams)
+            similarity = common / (len(query_grams) + len(grams) - common)
+            if similarity >= MIN_SIMILARITY:
+                matches[movie_id] = similarity
+        return matches
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[int, str, float]]:
+        """
+        Ranks titles for a (partial) query and returns up to `limit` (id, title, score) tuples.
+
+        Exact matches score 1.0, whole-title prefixes 0.9, word prefixes 0.8; everything
+        else is ranked by trigram similarity. Ties are broken by popularity.
+        """
+        normalized = normalize_title(query)
+        if not normalized:
+            return []
+
+        scores = {}
+        for movie_id, position in self._prefix_matches(normalized).items():
+            scores[movie_id] = 0.9 if position == 0 else 0.8
+        # Looked up separately since a precomputed prefix list may not include an unpopular exact match
+        for movie_id in self._exact.get(normalized, ()):
+            scores[movie_id] = 1.0
+
+        # Only pay for the trigram scan when prefixes alone can't fill the list
+        if len(scores) < limit:
+            for movie_id, similarity in self._fuzzy_matches(normalized).items():
+                if movie_id not in scores:
+                    scores[movie_id] = round(similarity * 0.8, 4)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -self._popularity[item[0]], self.titles[item[0]]))
+        return [(movie_id, self.titles[movie_id], score) for movie_id, score in ranked[:limit]]
+
+    def resolve(self, title: str) -> tuple[int, str] | None:
+        """Best (id, title) for a near-miss title, or None if nothing is close enough."""
+        normalized = normalize_title(title)
+        if not normalized:
+            return None
+        # An exact match after normalization ("the matrix!" -> "The Matrix") wins outright
+        exact = self._exact.get(normalized)
+        if exact:
+            best_id = max(exact, key=lambda movie_id: self._popularity[movie_id])
+            return best_id, self.titles[best_id]
+
+        fuzzy = self._fuzzy_matches(normalized)
+        if not fuzzy:
+            return None
+        best_id = max(fuzzy, key=lambda movie_id: (fuzzy[movie_id], self._popularity[movie_id]))
+        if fuzzy[best_id] < RESOLVE_MIN_SIMILARITY:
+            return None
+        return best_id, self.titles[best_id]
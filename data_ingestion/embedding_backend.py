@@ -0,0 +1,159 @@
+# movie_recommender/data_ingestion/embedding_backend.py
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Sentence Transformer model
+MODEL_NAME = 'all-MiniLM-L6-v2' # Good balance of performance and size
+
+# "torch"     - full-precision PyTorch (reference)
+# "onnx"      - ONNX Runtime, fp32
+# "onnx-int8" - ONNX Runtime with dynamic int8 quantization (needs an exported model, see `export --quantize`)
+BACKENDS = ("torch", "onnx", "onnx-int8")
+QUANTIZED_FILE_NAME = "onnx/model_int8.onnx"
+
+
+# Keep in sync with backend/app/encoder.py, which loads the query encoder the same way
+# (tests/test_embedding_backend.py checks that both produce the same models)
+def embedding_settings(backend=None, model_path=None):
+    """
+    Fills in (backend, model_path) from EMBEDDING_BACKEND / EMBEDDING_MODEL_PATH where not given.
+    Read on every call rather than at import, so values from a later load_dotenv() apply.
+    EMBEDDING_MODEL_PATH is a local dir written by `export`; unset means download MODEL_NAME.
+    """
+    if backend is None:
+        backend = os.getenv("EMBEDDING_BACKEND", "torch")
+    if model_path is None:
+        model_path = os.getenv("EMBEDDING_MODEL_PATH") or None
+    return backend, model_path
+
+
+def check_embedding_config(backend=None, model_path=None):
+    """Raises ValueError for settings that would otherwise only fail once the model is loaded."""
+    backend, model_path = embedding_settings(backend, model_path)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    if backend == "onnx-int8" and model_path is None:
+        raise ValueError("The onnx-int8 backend needs EMBEDDING_MODEL_PATH pointing at a model exported with --quantize")
+    if model_path is not None and not os.path.isdir(model_path):
+        raise ValueError(f"EMBEDDING_MODEL_PATH '{model_path}' is not a directory")
+
+
+def load_model(backend=None, model_path=None):
+    """Loads the embedding model on CPU with the requested (or configured) backend and path."""
+    backend, model_path = embedding_settings(backend, model_path)
+    check_embedding_config(backend, model_path)
+    return _build_model(backend, model_path)
+
+
+def _build_model(backend, model_path):
+    from sentence_transformers import SentenceTransformer
+
+    source = model_path or MODEL_NAME
+    # With a local export there is no reason to ever touch the network
+    kwargs = {"device": "cpu", "local_files_only": model_path is not None}
+    if backend == "torch":
+        return SentenceTransformer(source, **kwargs)
+    if backend == "onnx-int8":
+        kwargs["model_kwargs"] = {"file_name": QUANTIZED_FILE_NAME}
+    return SentenceTransformer(source, backend="onnx", **kwargs)
+
+
+def export_model(output_dir, quantize=None):
+    """
+    Exports MODEL_NAME to ONNX under output_dir (onnx/model.onnx). With quantize set to an
+    ONNX Runtime target ("avx2", "avx512", "avx512_vnni" or "arm64") it also writes a
+    dynamically int8-quantized copy to QUANTIZED_FILE_NAME.
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    print(f"Exporting {MODEL_NAME} to ONNX in {output_dir}...")
+    model = SentenceTransformer(MODEL_NAME, backend="onnx", device="cpu")
+    model.save(output_dir)
+    if quantize:
+        print(f"Quantizing to int8 for {quantize}...")
+        export_dynamic_quantized_onnx_model(model, quantize, output_dir, file_suffix="int8")
+    print("Export complete.")
+
+
+def _throughput(model, texts, batch_size):
+    model.encode(texts[:batch_size], batch_size=batch_size) # Warm-up (session init, allocator)
+    start = time.perf_counter()
+    model.encode(texts, batch_size=batch_size)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def cosine_agreement(reference_vectors, candidate_vectors):
+    """Row-wise cosine similarity between two (n, dim) arrays."""
+    reference_vectors = np.asarray(reference_vectors, dtype=np.float32)
+    candidate_vectors = np.asarray(candidate_vectors, dtype=np.float32)
+    reference_vectors = reference_vectors / np.linalg.norm(reference_vectors, axis=1, keepdims=True)
+    candidate_vectors = candidate_vectors / np.linalg.norm(candidate_vectors, axis=1, keepdims=True)
+    return np.sum(reference_vectors * candidate_vectors, axis=1)
+
+
+def check_backend(backend, model_path, texts, repeat=50, batch_size=64):
+    """
+    Reports the cosine agreement of the candidate backend with the reference PyTorch model
+    on the distinct texts, and both models' throughput on the texts tiled `repeat` times.
+    Returns the per-text cosine similarities.
+    """
+    texts = list(dict.fromkeys(texts))
+    # Always the Hub model by name, whatever EMBEDDING_MODEL_PATH says
+    reference = _build_model("torch", None)
+    candidate = load_model(backend, model_path)
+
+    agreement = cosine_agreement(reference.encode(texts, batch_size=batch_size),
+                                 candidate.encode(texts, batch_size=batch_size))
+    print(f"Cosine agreement with torch reference over {len(texts)} distinct texts: "
+          f"mean={agreement.mean():.5f} min={agreement.min():.5f}")
+
+    timing_texts = texts * repeat
+    reference_rate = _throughput(reference, timing_texts, batch_size)
+    candidate_rate = _throughput(candidate, timing_texts, batch_size)
+    print(f"Throughput over {len(timing_texts)} texts: torch={reference_rate:.1f} texts/s, "
+          f"{backend}={candidate_rate:.1f} texts/s ({candidate_rate / reference_rate:.2f}x)")
+    return agreement
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export and verify optimised CPU backends for the embedding model.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export the model to ONNX, optionally int8-quantized")
+    export_parser.add_argument("output_dir")
+    export_parser.add_argument("--quantize", choices=["avx2", "avx512", "avx512_vnni", "arm64"],
+                               help="Also write an int8 model tuned for this CPU target")
+
+    check_parser = subparsers.add_parser("check", help="Compare a backend against the torch reference")
+    check_parser.add_argument("--backend", choices=BACKENDS, help="Defaults to EMBEDDING_BACKEND")
+    check_parser.add_argument("--model-path", help="Defaults to EMBEDDING_MODEL_PATH")
+    check_parser.add_argument("--repeat", type=int, default=50, help="Tile the sample texts this many times for timing")
+    check_parser.add_argument("--min-agreement", type=float, default=0.99,
+                              help="Exit non-zero if the mean cosine agreement is below this")
+
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        export_model(args.output_dir, args.quantize)
+        return 0
+
+    # Importing populate_db also loads .env, so resolve the settings after it
+    from populate_db import SAMPLE_MOVIES, build_embedding_text
+    backend, model_path = embedding_settings(args.backend, args.model_path)
+    texts = [build_embedding_text(movie) for movie in SAMPLE_MOVIES]
+    agreement = check_backend(backend, model_path, texts, repeat=args.repeat)
+    if agreement.mean() < args.min_agreement:
+        print(f"Mean agreement is below {args.min_agreement}; do not use this backend for ingestion.")
+        return 1
+    return 0
+
+
+# Usage:
+# python embedding_backend.py export ./models/minilm-onnx --quantize avx2
+# python embedding_backend.py check --backend onnx-int8 --model-path ./models/minilm-onnx
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,7 @@
 import psycopg2
 import os
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
+from embedding_backend import MODEL_NAME, embedding_settings, load_model
 # numpy is often a dependency of sentence-transformers, but not directly used here for SQL conversion
 # psycopg2 can handle Python lists of floats for vector types if pgvector is set up.
 
@@ -19,8 +19,7 @@ DB_NAME = os.getenv("POSTGRES_DB")
 DB_USER = os.getenv("POSTGRES_USER")
 DB_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 
-# Sentence Transformer model
-MODEL_NAME = 'all-MiniLM-L6-v2' # Good balance of performance and size
+# Sentence Transformer model (MODEL_NAME and backend selection live in embedding_backend.py)
 EMBEDDING_DIM = 384 # This model outputs 384-dimensional embeddings
 
 # Sample movie data
@@ -158,6 +157,8 @@ def create_movies_table_if_not_exists(conn):
     # Choose one: IVFFlat is faster to build but might have lower recall for exact KNN. HNSW is often preferred.
     # create_index_query_ivfflat = "CREATE INDEX IF NOT EXISTS movies_embedding_ivfflat_idx ON movies USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);"
     create_index_query_hnsw = f"CREATE INDEX IF NOT EXISTS movies_embedding_hnsw_idx ON movies USING hnsw (embedding vector_cosine_ops);"
+    # The backend looks titles up with lower(title) = lower(%s); without this it is a sequential scan
+    create_index_query_title = "CREATE INDEX IF NOT EXISTS movies_title_lower_idx ON movies (lower(title));"
 
     # Trigger to update updated_at timestamp
     create_trigger_function_query = """
@@ -182,12 +183,19 @@ def create_movies_table_if_not_exists(conn):
         cur.execute(create_table_query)
         print("Creating HNSW index for embeddings (if it doesn't exist)...")
         cur.execute(create_index_query_hnsw) # Or IVFFlat
+        print("Creating lower(title) index for title lookups (if it doesn't exist)...")
+        cur.execute(create_index_query_title)
         print("Creating/Updating timestamp trigger function and trigger...")
         cur.execute(create_trigger_function_query)
         cur.execute(create_trigger_query)
         conn.commit()
         print("Table and index setup complete.")
 
+def build_embedding_text(movie):
+    """Creates a comprehensive text string for embedding."""
+    genres = ", ".join(movie.get("genres", [])) # Comma-separated string for embedding
+    return f"Title: {movie['title']}. Overview: {movie.get('overview', '')}. Genres: {genres}."
+
 def populate_data():
     """Fetches sample movies, generates embeddings, and upserts them into the database."""
     conn = None
@@ -195,21 +203,20 @@ def populate_data():
         conn = get_db_connection()
         create_movies_table_if_not_exists(conn) # Ensure table and index exist
 
-        print(f"Loading sentence transformer model: {MODEL_NAME}...")
-        model = SentenceTransformer(MODEL_NAME)
+        backend, model_path = embedding_settings()
+        print(f"Loading sentence transformer model: {MODEL_NAME} ({backend} backend, {model_path or 'Hub'})...")
+        model = load_model(backend, model_path)
         print("Model loaded.")
 
+        # One batched encode call instead of a forward pass per movie
+        print(f"Generating embeddings for {len(SAMPLE_MOVIES)} movies...")
+        texts = [build_embedding_text(movie) for movie in SAMPLE_MOVIES]
+        embeddings = model.encode(texts, batch_size=64)
+
         with conn.cursor() as cur:
-            for movie in SAMPLE_MOVIES:
+            for movie, embedding in zip(SAMPLE_MOVIES, embeddings):
                 title = movie["title"]
-                overview = movie.get("overview", "")
-                genres = ", ".join(movie.get("genres", [])) # Comma-separated string for embedding
-
-                # Create a comprehensive text string for embedding
-                text_to_embed = f"Title: {title}. Overview: {overview}. Genres: {genres}."
-
-                print(f"Generating embedding for: {title}")
-                embedding = model.encode(text_to_embed).tolist() # Encode and convert to Python list
+                embedding = embedding.tolist() # Convert to Python list
 
                 # Upsert logic: Insert if title doesn't exist, update if it does
                 # The unique_movie_title constraint on `title` is used for ON CONFLICT
@@ -4,12 +4,16 @@ from httpx import AsyncClient, ASGITransport
 from unittest.mock import patch, MagicMock
 import sys
 import os
+import types
+import numpy as np
 
 # Add the project root (parent of 'tests' and 'backend') to sys.path
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, PROJECT_ROOT)
 # Add the backend directory to sys.path
 sys.path.insert(0, os.path.join(PROJECT_ROOT, 'backend'))
+# Add the data_ingestion directory to sys.path (for embedding_backend)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'data_ingestion'))
 
 # Import your FastAPI app instance and the module it resides in
 try:
@@ -101,4 +105,44 @@ SAMPLE_SURPRISE_DETAILS = [
     (201, "Surprise Movie Alpha", "Overview for Surprise Movie Alpha", "/posterA.jpg", 2018),
     (202, "Surprise Movie Beta", "Overview for Surprise Movie Beta", "/posterB.jpg", 2019),
     (203, "Surprise Movie Gamma", "Overview for Surprise Movie Gamma", "/posterC.jpg", 2017),
-]
\ No newline at end of file
+]
+# (id, title, popularity) rows as loaded into the title index
+SAMPLE_TITLE_ROWS = [
+    (1, "Inception", 150.0),
+    (2, "The Dark Knight", 180.0),
+    (3, "Interstellar", 200.0),
+    (4, "Pulp Fiction", 140.0),
+    (5, "Breaking Bad", 250.0),
+    (6, "The Dark Knight Rises", 170.0),
+    (7, "Amélie", 90.0),
+]
+
+
+class FakeSentenceTransformer:
+    """
+    Stands in for sentence_transformers.SentenceTransformer; records how it was constructed.
+    Vectors point along `directions[backend]` scaled by text length, so tests can choose
+    whether two backends agree.
+    """
+    directions = {"torch": [1.0, 1.0], "onnx": [2.0, 2.0]}
+    instances = []
+
+    def __init__(self, model_name_or_path, **kwargs):
+        self.model_name_or_path = model_name_or_path
+        self.kwargs = kwargs
+        self.backend = kwargs.get("backend", "torch")
+        FakeSentenceTransformer.instances.append(self)
+
+    def encode(self, texts, batch_size=32):
+        direction = np.array(self.directions[self.backend])
+        return np.array([direction * len(text) for text in texts])
+
+
+@pytest.fixture
+def fake_sentence_transformers():
+    """Installs a fake sentence_transformers module (torch isn't needed to run the tests)."""
+    module = types.ModuleType("sentence_transformers")
+    module.SentenceTransformer = FakeSentenceTransformer
+    FakeSentenceTransformer.instances = []
+    with patch.dict(sys.modules, {"sentence_transformers": module}):
+        yield FakeSentenceTransformer
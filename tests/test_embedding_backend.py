@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+
+import embedding_backend
+import app.encoder as encoder_module
+from app.encoder import check_embedding_config, load_sentence_transformer
+from embedding_backend import MODEL_NAME, QUANTIZED_FILE_NAME, check_backend, cosine_agreement, load_model
+
+
+@pytest.fixture(autouse=True)
+def no_embedding_env(monkeypatch):
+    """Keeps a developer's EMBEDDING_* settings out of these tests."""
+    monkeypatch.delenv("EMBEDDING_BACKEND", raising=False)
+    monkeypatch.delenv("EMBEDDING_MODEL_PATH", raising=False)
+
+
+def test_load_model_torch_downloads_by_name(fake_sentence_transformers):
+    model = load_model("torch", None)
+    assert model.model_name_or_path == MODEL_NAME
+    assert model.kwargs == {"device": "cpu", "local_files_only": False}
+
+
+def test_load_model_onnx_from_local_path_stays_offline(fake_sentence_transformers, tmp_path):
+    model = load_model("onnx", str(tmp_path))
+    assert model.model_name_or_path == str(tmp_path)
+    assert model.kwargs == {"device": "cpu", "local_files_only": True, "backend": "onnx"}
+
+
+def test_load_model_int8_uses_quantized_file(fake_sentence_transformers, tmp_path):
+    model = load_model("onnx-int8", str(tmp_path))
+    assert model.kwargs["backend"] == "onnx"
+    assert model.kwargs["model_kwargs"] == {"file_name": QUANTIZED_FILE_NAME}
+
+
+@pytest.mark.parametrize("backend, model_path, message", [
+    ("onnx-int8", None, "needs EMBEDDING_MODEL_PATH"),
+    ("tensorrt", None, "Unknown embedding backend"),
+    ("onnx", "/does/not/exist", "is not a directory"),
+])
+def test_load_model_rejects_bad_config(fake_sentence_transformers, backend, model_path, message):
+    with pytest.raises(ValueError, match=message):
+        load_model(backend, model_path)
+    assert fake_sentence_transformers.instances == []
+
+
+def test_cosine_agreement_normalises_rows():
+    agreement = cosine_agreement([[1.0, 0.0], [1.0, 1.0]], [[2.0, 0.0], [3.0, 0.0]])
+    assert agreement == pytest.approx([1.0, np.sqrt(0.5)])
+
+
+def test_check_backend_scores_distinct_texts(fake_sentence_transformers, capsys):
+    texts = ["Title: A.", "Title: Bee.", "Title: A."]
+
+    agreement = check_backend("onnx", None, texts, repeat=3)
+
+    # Same direction, different magnitude: agreement is 1 once vectors are normalised
+    assert agreement == pytest.approx([1.0, 1.0])
+    output = capsys.readouterr().out
+    assert "over 2 distinct texts" in output
+    assert "Throughput over 6 texts" in output
+
+
+def test_main_check_exit_code_follows_min_agreement(fake_sentence_transformers, monkeypatch):
+    assert embedding_backend.main(["check", "--backend", "onnx", "--repeat", "1"]) == 0
+
+    monkeypatch.setitem(fake_sentence_transformers.directions, "onnx", [1.0, -1.0])
+    assert embedding_backend.main(["check", "--backend", "onnx", "--repeat", "1"]) == 1
+
+
+# The API's query encoder has its own copy of the loader; it must behave the same way
+def _loader_outcome(loader, backend, model_path):
+    try:
+        model = loader(backend, model_path)
+    except ValueError as e:
+        return ("ValueError", str(e))
+    return (model.model_name_or_path, model.kwargs)
+
+
+def test_backend_constants_match_ingestion():
+    assert encoder_module.BACKENDS == embedding_backend.BACKENDS
+    assert encoder_module.QUANTIZED_FILE_NAME == embedding_backend.QUANTIZED_FILE_NAME
+    assert encoder_module.MODEL_NAME == embedding_backend.MODEL_NAME
+
+
+@pytest.mark.parametrize("env_backend", [None, "onnx-int8"])
+@pytest.mark.parametrize("env_path", [None, "existing"])
+@pytest.mark.parametrize("model_path", [None, "existing", "missing"])
+@pytest.mark.parametrize("backend", [*embedding_backend.BACKENDS, "tensorrt", None])
+def test_load_sentence_transformer_matches_ingestion_loader(
+    fake_sentence_transformers, monkeypatch, tmp_path, backend, model_path, env_path, env_backend
+):
+    """Every backend/path/env combination must build the same model (or raise the same error) in both images."""
+    paths = {None: None, "existing": str(tmp_path), "missing": str(tmp_path / "missing")}
+    if env_backend is not None:
+        monkeypatch.setenv("EMBEDDING_BACKEND", env_backend)
+    if env_path is not None:
+        monkeypatch.setenv("EMBEDDING_MODEL_PATH", paths[env_path])
+
+    ingestion = _loader_outcome(load_model, backend, paths[model_path])
+    api = _loader_outcome(load_sentence_transformer, backend, paths[model_path])
+    assert api == ingestion
+
+
+def test_int8_without_model_path_fails_before_touching_the_hub(fake_sentence_transformers):
+    with pytest.raises(ValueError, match="needs EMBEDDING_MODEL_PATH"):
+        check_embedding_config("onnx-int8", None)
+    with pytest.raises(ValueError, match="needs EMBEDDING_MODEL_PATH"):
+        load_sentence_transformer("onnx-int8", None)
+    assert fake_sentence_transformers.instances == []
+
+
+
+def test_settings_are_read_when_called_not_when_imported(fake_sentence_transformers, monkeypatch, tmp_path):
+    # Both modules are already imported; this mirrors load_dotenv() running after the import
+    monkeypatch.setenv("EMBEDDING_BACKEND", "onnx-int8")
+    monkeypatch.setenv("EMBEDDING_MODEL_PATH", str(tmp_path))
+
+    for model in (load_model(), load_sentence_transformer()):
+        assert model.model_name_or_path == str(tmp_path)
+        assert model.kwargs["model_kwargs"] == {"file_name": QUANTIZED_FILE_NAME}
+
+    monkeypatch.delenv("EMBEDDING_MODEL_PATH")
+    with pytest.raises(ValueError, match="needs EMBEDDING_MODEL_PATH"):
+        check_embedding_config()
+    with pytest.raises(ValueError, match="needs EMBEDDING_MODEL_PATH"):
+        embedding_backend.check_embedding_config()
+
+
+def test_main_check_defaults_to_env_settings(fake_sentence_transformers, monkeypatch):
+    monkeypatch.setenv("EMBEDDING_BACKEND", "onnx")
+
+    assert embedding_backend.main(["check", "--repeat", "1"]) == 0
+    reference, candidate = fake_sentence_transformers.instances
+    assert reference.backend == "torch"
+    assert candidate.backend == "onnx"
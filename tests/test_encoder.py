@@ -0,0 +1,94 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.encoder import BatchingEncoder
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeModel:
+    """Stands in for SentenceTransformer; records the batches it was asked to encode."""
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, batch_size=32):
+        self.batches.append(list(texts))
+        return np.array([[float(len(text)), 1.0] for text in texts])
+
+
+def make_encoder(**kwargs):
+    model = FakeModel()
+    return BatchingEncoder(load_model=lambda: model, **kwargs), model
+
+
+async def test_concurrent_queries_share_one_batch():
+    encoder, model = make_encoder(max_batch_size=8, max_wait_ms=20)
+    texts = ["space heist", "gangster drama", "sad robots", "time loop"]
+
+    vectors = await asyncio.gather(*(encoder.encode(text) for text in texts))
+
+    assert model.batches == [texts]
+    assert [v[0] for v in vectors] == [float(len(text)) for text in texts]
+
+
+async def test_batches_are_capped_at_max_batch_size():
+    encoder, model = make_encoder(max_batch_size=2, max_wait_ms=20)
+
+    await asyncio.gather(*(encoder.encode(f"query {i}") for i in range(5)))
+
+    assert [len(batch) for batch in model.batches] == [2, 2, 1]
+
+
+async def test_repeated_and_duplicate_queries_hit_the_cache():
+    encoder, model = make_encoder(max_wait_ms=20)
+
+    # Duplicates in flight are encoded once; normalized repeats come from the cache
+    await asyncio.gather(encoder.encode("Heist movie"), encoder.encode("heist  movie"))
+    await encoder.encode("HEIST movie ")
+
+    assert model.batches == [["heist movie"]]
+
+
+async def test_cache_evicts_least_recently_used():
+    encoder, model = make_encoder(max_wait_ms=0, cache_size=1)
+
+    await encoder.encode("first")
+    await encoder.encode("second")
+    await encoder.encode("first")
+
+    assert model.batches == [["first"], ["second"], ["first"]]
+
+
+async def test_model_errors_propagate_and_worker_keeps_running():
+    calls = []
+
+    class FlakyModel(FakeModel):
+        def encode(self, texts, batch_size=32):
+            calls.append(texts)
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+            return super().encode(texts, batch_size)
+
+    encoder = BatchingEncoder(load_model=FlakyModel, max_wait_ms=0)
+
+    with pytest.raises(RuntimeError):
+        await encoder.encode("first")
+    vector = await encoder.encode("second")
+    assert vector[0] == float(len("second"))
+
+
+async def test_failed_model_load_is_not_retried():
+    attempts = []
+
+    def broken_loader():
+        attempts.append(1)
+        raise OSError("model not found")
+
+    encoder = BatchingEncoder(load_model=broken_loader, max_wait_ms=0)
+    for text in ("first", "second"):
+        with pytest.raises(OSError):
+            await encoder.encode(text)
+    assert len(attempts) == 1
@@ -7,8 +7,12 @@ import psycopg2 # For psycopg2.OperationalError
 from tests.conftest import (
     SAMPLE_MOVIE_EMBEDDINGS,
     SAMPLE_RECOMMENDATION_DETAILS,
-    SAMPLE_SURPRISE_DETAILS
+    SAMPLE_SURPRISE_DETAILS,
+    SAMPLE_TITLE_ROWS
 )
+import app.main as app_main_module
+from app.encoder import BatchingEncoder
+from app.title_index import TitleIndex
 
 # Mark all tests in this module to use pytest-asyncio for async functions
 pytestmark = pytest.mark.asyncio
@@ -222,3 +226,268 @@ async def test_recommend_movies_non_string_titles(client: AsyncClient):
     input_titles = ["Inception", 123, None]
     response = await client.post("/recommend", json=input_titles)
     assert response.status_code == 422
+
+
+async def test_autocomplete_returns_ranked_suggestions(client: AsyncClient, mock_db_connection):
+    """Test /autocomplete serves suggestions from the in-memory title index without querying the DB."""
+    mock_get_conn, mock_cursor = mock_db_connection
+    with patch.object(app_main_module, "title_index", TitleIndex(SAMPLE_TITLE_ROWS)):
+        response = await client.get("/autocomplete", params={"q": "the dark", "limit": 2})
+
+    assert response.status_code == 200
+    suggestions = response.json()["suggestions"]
+    assert [s["title"] for s in suggestions] == ["The Dark Knight", "The Dark Knight Rises"]
+    mock_get_conn.assert_not_called()
+
+
+async def test_autocomplete_builds_index_lazily(client: AsyncClient, mock_db_connection):
+    """Test /autocomplete loads the title index from the DB when startup did not build it."""
+    mock_get_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchall.return_value = SAMPLE_TITLE_ROWS
+    with patch.object(app_main_module, "title_index", None):
+        response = await client.get("/autocomplete", params={"q": "incep"})
+        assert app_main_module.title_index is not None
+
+    assert response.status_code == 200
+    assert response.json()["suggestions"][0]["title"] == "Inception"
+    mock_cursor.execute.assert_called_once()
+
+
+async def test_autocomplete_validates_query(client: AsyncClient):
+    """Test /autocomplete rejects an empty query and out-of-range limits."""
+    assert (await client.get("/autocomplete", params={"q": ""})).status_code == 422
+    assert (await client.get("/autocomplete", params={"q": "in", "limit": 0})).status_code == 422
+
+
+async def test_recommend_movies_resolves_near_miss_title(client: AsyncClient, mock_db_connection):
+    """Test /recommend falls back to the title index when the exact lookup misses."""
+    mock_get_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchone.side_effect = [
+        (1, [0.1, 0.2]),  # Inception
+        None,             # "Interstelar" exact lookup misses
+        (3, [0.3, 0.4]),  # ...resolved by id through the index
+        (2, [0.2, 0.3]),  # The Dark Knight
+    ]
+    mock_cursor.fetchall.return_value = SAMPLE_RECOMMENDATION_DETAILS[:3]
+
+    with patch.object(app_main_module, "title_index", TitleIndex(SAMPLE_TITLE_ROWS)):
+        response = await client.post("/recommend", json=["Inception", " Interstelar ", "The Dark Knight"])
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["recommendations"]) == 3
+    # The correction is reported (keyed by the stripped input) so the frontend can show "showing results for ..."
+    assert data["resolved_titles"] == {"Interstelar": "Interstellar"}
+    resolve_call = mock_cursor.execute.call_args_list[2]
+    assert resolve_call[0][1] == (3,)
+
+
+class FakeEncoderModel:
+    def encode(self, texts, batch_size=32):
+        return [[0.1] * 384 for _ in texts]
+
+
+async def test_recommend_from_text_success(client: AsyncClient, mock_db_connection):
+    """Test /recommend/text encodes the query and runs a single vector search."""
+    mock_get_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchall.return_value = SAMPLE_RECOMMENDATION_DETAILS[:3]
+    encoder = BatchingEncoder(load_model=FakeEncoderModel, max_wait_ms=0)
+
+    with patch.object(app_main_module, "text_encoder", encoder):
+        response = await client.post("/recommend/text", json={"query": "a mind-bending heist in dreams"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [r["id"] for r in data["recommendations"]] == [101, 102, 103]
+    mock_cursor.execute.assert_called_once()
+    query_sql, params = mock_cursor.execute.call_args[0]
+    assert "ORDER BY embedding <=> %s::vector" in query_sql
+    assert params[0].startswith("[0.1,")
+
+
+async def test_recommend_from_text_validates_query(client: AsyncClient):
+    """Test /recommend/text rejects missing, empty and blank queries."""
+    assert (await client.post("/recommend/text", json={})).status_code == 422
+    assert (await client.post("/recommend/text", json={"query": ""})).status_code == 422
+    assert (await client.post("/recommend/text", json={"query": "   "})).status_code == 400
+
+
+async def test_recommend_from_text_encoder_unavailable(client: AsyncClient, mock_db_connection):
+    """Test /recommend/text returns 503 when the model can't be loaded."""
+    mock_get_conn, mock_cursor = mock_db_connection
+
+    def broken_loader():
+        raise OSError("model not found")
+
+    with patch.object(app_main_module, "text_encoder", BatchingEncoder(load_model=broken_loader, max_wait_ms=0)):
+        response = await client.post("/recommend/text", json={"query": "anything"})
+
+    assert response.status_code == 503
+    assert response.json()["detail"] == "Text encoder unavailable"
+    mock_get_conn.assert_not_called()
+
+
+
+def make_fetchone_handler(rows):
+    """fetchone side effect returning rows in order."""
+    remaining = list(rows)
+    return lambda: remaining.pop(0) if remaining else None
+
+
+async def test_recommend_limit_and_fields_are_pushed_into_sql(client: AsyncClient, mock_db_connection):
+    """Test ?limit and ?fields shape the SQL instead of trimming rows in Python."""
+    mock_get_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchone.side_effect = make_fetchone_handler(
+        [(1, [0.1, 0.2]), (2, [0.2, 0.3]), (3, [0.3, 0.4])]
+    )
+    mock_cursor.fetchall.return_value = [(101, "Recommended Movie 1"), (102, "Recommended Movie 2")]
+
+    response = await client.post(
+        "/recommend",
+        params={"limit": 2, "fields": "id,title"},
+        json=["Inception", "The Dark Knight", "Interstellar"],
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "recommendations": [
+            {"id": 101, "title": "Recommended Movie 1"},
+            {"id": 102, "title": "Recommended Movie 2"},
+        ],
+        "resolved_titles": {},
+    }
+    query_sql, params = mock_cursor.execute.call_args[0]
+    assert "SELECT id, title\n" in query_sql
+    assert "overview" not in query_sql
+    assert "LIMIT %s" in query_sql
+    assert params[-1] == 2
+
+
+async def test_recommend_rejects_bad_limit_and_fields(client: AsyncClient):
+    """Test limit is range-checked and fields are restricted to known columns."""
+    titles = ["Inception", "The Dark Knight", "Interstellar"]
+    response = await client.post("/recommend", params={"limit": 0}, json=titles)
+    assert response.status_code == 422
+    response = await client.post("/recommend", params={"limit": 51}, json=titles)
+    assert response.status_code == 422
+
+    response = await client.post("/recommend", params={"fields": "id,embedding"}, json=titles)
+    assert response.status_code == 400
+    assert "Unknown field(s): embedding" in response.json()["detail"]
+
+
+async def test_surprise_me_limit_and_fields(client: AsyncClient, mock_db_connection):
+    """Test /surprise pushes limit and column selection into the query."""
+    mock_get_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchall.return_value = [("Surprise Movie Alpha",)]
+
+    response = await client.get("/surprise", params={"limit": 1, "fields": "title"})
+
+    assert response.status_code == 200
+    assert response.json() == {"surprises": [{"title": "Surprise Movie Alpha"}]}
+    query_sql, params = mock_cursor.execute.call_args[0]
+    assert "SELECT title\n" in query_sql
+    assert params == (1,)
+    assert "etag" not in response.headers
+
+
+async def test_get_recommend_returns_etag_and_304(client: AsyncClient, mock_db_connection):
+    """Test GET /recommend revalidates with If-None-Match without touching the DB."""
+    mock_get_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchone.side_effect = make_fetchone_handler(
+        [(1, [0.1, 0.2]), (2, [0.2, 0.3]), (3, [0.3, 0.4])]
+    )
+    mock_cursor.fetchall.return_value = SAMPLE_RECOMMENDATION_DETAILS[:3]
+    params = {"title": ["Inception", "The Dark Knight", "Interstellar"]}
+
+    with patch.object(app_main_module, "catalog_version", "10:1700000000.0"):
+        first = await client.get("/recommend", params=params)
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+        assert len(first.json()["recommendations"]) == 3
+        mock_get_conn.reset_mock()
+
+        # Surrounding whitespace is stripped before anything else, so it's the same representation
+        padded = {"title": [" Inception", "The Dark Knight ", "Interstellar"]}
+        second = await client.get("/recommend", params=padded, headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.headers["etag"] == etag
+        assert second.content == b""
+        mock_get_conn.assert_not_called()
+
+        # Case, inner spacing and order can change resolved_titles, so each gets its own ETag
+        for variant in (
+            ["inception", "the dark knight", "interstellar"],
+            ["Inception", "The  Dark Knight", "Interstellar"],
+            ["Interstellar", "Inception", "The Dark Knight"],
+        ):
+            mock_cursor.fetchone.side_effect = make_fetchone_handler(
+                [(1, [0.1, 0.2]), (2, [0.2, 0.3]), (3, [0.3, 0.4])]
+            )
+            response = await client.get("/recommend", params={"title": variant}, headers={"If-None-Match": etag})
+            assert response.status_code == 200
+            assert response.headers["etag"] != etag
+
+        # A different limit is a different representation
+        mock_cursor.fetchone.side_effect = make_fetchone_handler(
+            [(1, [0.1, 0.2]), (2, [0.2, 0.3]), (3, [0.3, 0.4])]
+        )
+        third = await client.get("/recommend", params={**params, "limit": 5}, headers={"If-None-Match": etag})
+        assert third.status_code == 200
+        assert third.headers["etag"] != etag
+
+    # A new catalog version invalidates old ETags
+    with patch.object(app_main_module, "catalog_version", "11:1700000500.0"):
+        mock_cursor.fetchone.side_effect = make_fetchone_handler(
+            [(1, [0.1, 0.2]), (2, [0.2, 0.3]), (3, [0.3, 0.4])]
+        )
+        fourth = await client.get("/recommend", params=params, headers={"If-None-Match": etag})
+        assert fourth.status_code == 200
+
+
+async def test_no_etag_until_catalog_version_is_known(client: AsyncClient):
+    """Test ETags are only issued once the catalog version has been loaded."""
+    with patch.object(app_main_module, "catalog_version", None), \
+         patch.object(app_main_module, "title_index", TitleIndex(SAMPLE_TITLE_ROWS)):
+        response = await client.get("/autocomplete", params={"q": "incep"}, headers={"If-None-Match": "*"})
+
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+
+
+async def test_refresh_catalog_rebuilds_title_index_on_change(mock_db_connection):
+    """Test the catalog refresher only reloads the title index when the version changes."""
+    mock_get_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchone.return_value = (7, None)
+    mock_cursor.fetchall.return_value = SAMPLE_TITLE_ROWS
+
+    with patch.object(app_main_module, "catalog_version", None), \
+         patch.object(app_main_module, "title_index", None):
+        app_main_module.refresh_catalog()
+        assert app_main_module.catalog_version == "7:0"
+        assert len(app_main_module.title_index) == len(SAMPLE_TITLE_ROWS)
+
+        mock_cursor.fetchall.reset_mock()
+        app_main_module.refresh_catalog()
+        mock_cursor.fetchall.assert_not_called()
+
+
+async def test_periodic_refresh_swaps_index_and_version_together(mock_db_connection):
+    """Test the background refresh only publishes the new index together with its version."""
+    mock_get_conn, mock_cursor = mock_db_connection
+    mock_cursor.fetchone.return_value = (7, None)
+    mock_cursor.fetchall.return_value = SAMPLE_TITLE_ROWS
+    old_index = TitleIndex([])
+
+    with patch.object(app_main_module, "catalog_version", "6:0"), \
+         patch.object(app_main_module, "title_index", old_index):
+        # Building the update on the worker thread must not touch the published globals
+        update = app_main_module.fetch_catalog_update("6:0")
+        assert app_main_module.title_index is old_index
+        assert app_main_module.catalog_version == "6:0"
+
+        app_main_module.apply_catalog_update(update)
+        assert app_main_module.catalog_version == "7:0"
+        assert len(app_main_module.title_index) == len(SAMPLE_TITLE_ROWS)
+
+        assert app_main_module.fetch_catalog_update("7:0") is None
@@ -0,0 +1,62 @@
+from app.title_index import PREFIX_SCAN_LIMIT, TitleIndex, normalize_title
+
+from tests.conftest import SAMPLE_TITLE_ROWS
+
+
+def test_normalize_title_strips_case_accents_and_punctuation():
+    assert normalize_title("  Amélie!! ") == "amelie"
+    assert normalize_title("The Office (US)") == "the office us"
+    assert normalize_title("???") == ""
+
+
+def test_search_ranks_whole_title_prefix_above_word_prefix():
+    index = TitleIndex(SAMPLE_TITLE_ROWS)
+    results = index.search("the dark", limit=5)
+    titles = [title for _, title, _ in results]
+    # Both start with "the dark"; the more popular one comes first
+    assert titles[:2] == ["The Dark Knight", "The Dark Knight Rises"]
+
+    results = index.search("knight", limit=5)
+    assert {title for _, title, _ in results} >= {"The Dark Knight", "The Dark Knight Rises"}
+
+
+def test_search_exact_match_scores_highest():
+    index = TitleIndex(SAMPLE_TITLE_ROWS)
+    movie_id, title, score = index.search("the dark knight", limit=5)[0]
+    assert (movie_id, title, score) == (2, "The Dark Knight", 1.0)
+
+
+def test_search_falls_back_to_fuzzy_matching():
+    index = TitleIndex(SAMPLE_TITLE_ROWS)
+    results = index.search("interstelar", limit=3)
+    assert results[0][1] == "Interstellar"
+    assert results[0][2] < 0.8
+
+
+def test_search_respects_limit_and_empty_query():
+    index = TitleIndex(SAMPLE_TITLE_ROWS)
+    assert len(index.search("the", limit=1)) == 1
+    assert index.search("   ", limit=5) == []
+
+
+def test_resolve_near_miss_titles():
+    index = TitleIndex(SAMPLE_TITLE_ROWS)
+    assert index.resolve("amelie") == (7, "Amélie")
+    assert index.resolve("Pulp Fictoin") == (4, "Pulp Fiction")
+    assert index.resolve("Completely Unrelated") is None
+
+
+def test_common_prefixes_rank_by_popularity_across_the_whole_catalog():
+    # More keys start with "the" than PREFIX_SCAN_LIMIT, and the popular title sorts last
+    rows = [(i, f"The A{i:04d} Movie", 1.0) for i in range(PREFIX_SCAN_LIMIT * 3)]
+    rows.append((99999, "The Zebra Story", 10000.0))
+    rows.append((99998, "The", 0.5))
+    index = TitleIndex(rows)
+
+    results = index.search("the", limit=5)
+    assert results[0] == (99998, "The", 1.0) # Exact match still wins
+    assert results[1][1] == "The Zebra Story"
+
+    assert index.search("t", limit=1)[0][1] == "The Zebra Story"
+    assert index.search("the a0", limit=3)[0][1] == "The A0000 Movie"
+    assert len(index.search("movie", limit=50)) == 50